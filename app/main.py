@@ -4,89 +4,249 @@ Simple FastAPI application for weather predictions.
 This file defines your API endpoints. Read through it to understand how it works.
 """
 
-from fastapi import FastAPI, HTTPException, Query
-from datetime import datetime
-from predictor import predict_rain, predict_precipitation
+import hashlib
+import orjson
+from contextlib import asynccontextmanager
+from functools import wraps
+from fastapi import Body, FastAPI, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+import datetime as dt
+from predictor import load_models, models_version, predict_rain, predict_rain_batch, predict_precipitation
+from weather_api import open_cache, close_cache, open_client, close_client, sydney_today
+
+
+# Load the models as soon as this file is imported. With gunicorn --preload
+# that happens once, before the worker processes are started, so all
+# workers share the same copy of the models in memory.
+load_models()
+MODELS_VERSION = models_version()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Runs once when the server starts (before yield) and once when it stops (after)
+    """
+    open_cache()
+    open_client()
+    yield
+    await close_client()
+    close_cache()
+
 
 # Create the API
 app = FastAPI(
     title="Weather Prediction API",
-    description="Predicts rain and precipitation for Sydney"
+    description="Predicts rain and precipitation for Sydney",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson is much faster than json
 )
 
 
+# How long browsers/CDNs may reuse a response (seconds).
+# Predictions are for past dates, so they never change.
+CACHE_CONTROL = {
+    "/predict/": "public, max-age=86400, immutable",
+    "/": "public, max-age=3600",
+}
+
+
+def make_etag(body):
+    """Short fingerprint of a response body, for the ETag header"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def prediction_etag(path, date):
+    """
+    ETag for a prediction, worked out from the URL alone.
+
+    The same date (with the same model files) always gives the same
+    prediction, so this is known before running anything - every worker
+    and every restart agrees on it.
+    """
+    endpoint = path.strip("/").replace("/", "-")
+    return f'W/"{endpoint}-{MODELS_VERSION}-{date}"'
+
+
+def etag_matches(headers, etag):
+    """True if the request headers say the client already has the response with this ETag"""
+    if_none_match = headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    etag = etag.removeprefix("W/")
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+# The home page never changes, so turn it into JSON once at startup
+HOME_JSON = orjson.dumps({
+    "project": "Weather Prediction API",
+    "endpoints": [
+        "GET / - This page",
+        "GET /health/ - Health check",
+        "GET /predict/rain/?date=YYYY-MM-DD - Rain prediction",
+        "POST /predict/rain/batch/ {\"dates\": [\"YYYY-MM-DD\", ...]} - Rain predictions for many dates",
+        "GET /predict/precipitation/fall/?date=YYYY-MM-DD - Precipitation prediction"
+    ],
+    "example": "http://localhost:8000/predict/rain/?date=2024-09-15",
+    "docs": "/docs"
+})
+
+# ETags of the responses that never change (CacheHeaders adds them)
+FIXED_ETAGS = {"/": make_etag(HOME_JSON)}
+
+
 @app.get("/")
-def home():
+async def home():
     """
     Root endpoint - shows info about your API
     """
-    return {
-        "project": "Weather Prediction API",
-        "endpoints": [
-            "GET / - This page",
-            "GET /health/ - Health check",
-            "GET /predict/rain/?date=YYYY-MM-DD - Rain prediction",
-            "GET /predict/precipitation/fall/?date=YYYY-MM-DD - Precipitation prediction"
-        ],
-        "example": "http://localhost:8000/predict/rain/?date=2024-09-15",
-        "docs": "/docs"
-    }
+    return Response(content=HOME_JSON, media_type="application/json")
+
+
+# Health checks can arrive every second, so this answer is ready-made too
+HEALTH_JSON = orjson.dumps({"status": "healthy"})
 
 
 @app.get("/health/")
-def health():
+async def health():
     """
     Health check - used by Render to check if your app is running
     """
-    return {"status": "healthy"}
+    return Response(content=HEALTH_JSON, media_type="application/json")
+
+
+def looks_like_date(date):
+    """Quick check that date is shaped like 2024-09-15 (no regex, no parsing)"""
+    return len(date) == 10 and date[4] == "-" and date[7] == "-"
+
+
+def parse_date(date):
+    """Turn 'YYYY-MM-DD' into a datetime.date (ValueError if it isn't one)"""
+    # Quick shape check - rejects junk without trying to parse it.
+    # fromisoformat is written in C and much faster than strptime; it also
+    # rejects anything that isn't digits (e.g. 2024-0a-15).
+    if not looks_like_date(date):
+        raise ValueError(f"Invalid date '{date}', use YYYY-MM-DD")
+
+    return dt.date.fromisoformat(date)
+
+
+def is_past_date(date):
+    """True if date is a real YYYY-MM-DD date that isn't in the future"""
+    try:
+        return parse_date(date) <= sydney_today()
+    except ValueError:
+        return False
+
+
+class CacheHeaders:
+    """
+    Adds ETag + Cache-Control headers to GET responses.
+
+    If the client already has this exact response (its If-None-Match
+    header matches our ETag) we send back an empty 304 Not Modified instead.
+
+    Written as plain ASGI middleware (not @app.middleware("http")), which
+    adds almost nothing to each request - even the ones it doesn't touch.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        # Every cached response has an ETag we know before running anything
+        path = scope["path"]
+        if path.startswith("/predict/"):
+            cache_control = CACHE_CONTROL["/predict/"]
+            date = QueryParams(scope["query_string"]).get("date", "")
+            etag = prediction_etag(path, date) if is_past_date(date) else None
+        else:
+            cache_control = CACHE_CONTROL.get(path)
+            etag = FIXED_ETAGS.get(path)
+
+        if cache_control is None:
+            return await self.app(scope, receive, send)
+
+        headers = {"Cache-Control": cache_control}
+        if etag is not None:
+            headers["ETag"] = etag
+            # The client already has this response - skip everything
+            if etag_matches(Headers(scope=scope), etag):
+                return await Response(status_code=304, headers=headers)(scope, receive, send)
+
+        async def send_with_headers(message):
+            # Add the headers to successful responses only (not errors)
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+app.add_middleware(CacheHeaders)
+
+
+def prediction_endpoint(endpoint):
+    """
+    Shared error handling for the prediction endpoints.
+
+    Runs the endpoint and turns any error into the right HTTP response.
+    """
+    @wraps(endpoint)
+    async def wrapper(**kwargs):
+        try:
+            return await endpoint(**kwargs)
+
+        except ValueError as e:
+            # Bad date or other validation error
+            raise HTTPException(status_code=400, detail=str(e))
+        except FileNotFoundError as e:
+            # Model files missing
+            raise HTTPException(status_code=404, detail=f"Model not found: {str(e)}")
+        except Exception as e:
+            # Something else went wrong
+            raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+    return wrapper
 
 
 @app.get("/predict/rain/")
-def rain_prediction(date: str = Query(..., description="Date in YYYY-MM-DD format")):
+@prediction_endpoint
+async def rain_prediction(date: str = Query(..., description="Date in YYYY-MM-DD format")):
     """
     Predicts if it will rain 7 days from the given date.
 
     Example: /predict/rain/?date=2024-09-15
     Returns prediction for 2024-09-22
     """
-    try:
-        # Validate date format
-        datetime.strptime(date, "%Y-%m-%d")
+    # Parse the date once here, then pass it along
+    return await predict_rain(parse_date(date))
+
 
-        # Make prediction
-        result = predict_rain(date)
-        return result
+@app.post("/predict/rain/batch/")
+@prediction_endpoint
+async def rain_prediction_batch(dates: list[str] = Body(..., embed=True, description="Dates in YYYY-MM-DD format")):
+    """
+    Predicts rain 7 days ahead for many dates in one request.
 
-    except ValueError as e:
-        # Bad date format or other validation error
-        raise HTTPException(status_code=400, detail=str(e))
-    except FileNotFoundError as e:
-        # Model files missing
-        raise HTTPException(status_code=404, detail=f"Model not found: {str(e)}")
-    except Exception as e:
-        # Something else went wrong
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    Example body: {"dates": ["2024-09-15", "2024-09-16"]}
+    Returns a list with one rain prediction per date, in the same order
+    """
+    return await predict_rain_batch([parse_date(date) for date in dates])
 
 
 @app.get("/predict/precipitation/fall/")
-def precipitation_prediction(date: str = Query(..., description="Date in YYYY-MM-DD format")):
+@prediction_endpoint
+async def precipitation_prediction(date: str = Query(..., description="Date in YYYY-MM-DD format")):
     """
     Predicts precipitation for the next 3 days from the given date.
 
     Example: /predict/precipitation/fall/?date=2024-09-15
     Returns prediction for 2024-09-16 to 2024-09-18
     """
-    try:
-        # Validate date format
-        datetime.strptime(date, "%Y-%m-%d")
-
-        # Make prediction
-        result = predict_precipitation(date)
-        return result
-
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=f"Model not found: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    return await predict_precipitation(parse_date(date))
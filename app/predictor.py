@@ -4,96 +4,460 @@ Loads models and makes predictions.
 THIS IS WHERE YOU CUSTOMIZE TO MATCH YOUR TRAINING!
 """
 
+import asyncio
+import hashlib
 import joblib
+import math
+import operator
+import os
+import struct
+import threading
 import numpy as np
-from datetime import datetime, timedelta
-from weather_api import get_weather
+from collections import OrderedDict
+from datetime import timedelta
+from sklearn.linear_model import (
+    ElasticNet, Lasso, LinearRegression, LogisticRegression, Ridge,
+    RidgeClassifier, SGDClassifier, SGDRegressor,
+)
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.svm import LinearSVC
+from weather_api import get_weather, get_weather_days
 
 
 # Global variables to cache loaded models
 _rain_model = None
 _rain_preprocessor = None
+_rain_predict = None  # scaler + model in one step (see build_predict)
 _precip_model = None
 _precip_preprocessor = None
+_precip_predict = None  # scaler + model in one step
+
+# Linear models whose scaler can be folded into the weights
+LINEAR_CLASSIFIERS = (LogisticRegression, RidgeClassifier, SGDClassifier, LinearSVC)
+LINEAR_REGRESSORS = (LinearRegression, Ridge, Lasso, ElasticNet, SGDRegressor)
+
+# How many predictions to remember per endpoint.
+# Weather for a past date never changes, so neither does its prediction -
+# repeat requests for the same date are answered straight from memory.
+PREDICTION_CACHE_SIZE = 4096
+_rain_cache = OrderedDict()
+_precip_cache = OrderedDict()
+
+
+def _cache_get(cache, date_obj):
+    """Look up a remembered prediction (None if we haven't seen this date)"""
+    result = cache.get(date_obj)
+    if result is not None:
+        cache.move_to_end(date_obj)
+    return result
+
+
+def _cache_put(cache, date_obj, result):
+    """Remember a prediction, forgetting the oldest one when the cache is full"""
+    cache[date_obj] = result
+    if len(cache) > PREDICTION_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def load_model_file(folder):
+    """
+    Load the trained model from a models/ folder.
+
+    Uses model.onnx with ONNX Runtime if you exported one (faster for
+    non-linear models, but skips build_predict's linear fold and threshold),
+    otherwise falls back to model.joblib.
+    """
+    onnx_path = os.path.join(folder, 'model.onnx')
+    if not os.path.exists(onnx_path):
+        return joblib.load(os.path.join(folder, 'model.joblib'), mmap_mode='r')
+
+    # Only needed if you use ONNX: poetry install --extras onnx
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = 1  # one small prediction per request
+    return onnxruntime.InferenceSession(
+        onnx_path, sess_options=options, providers=['CPUExecutionProvider']
+    )
+
+
+def run_model(model, X):
+    """
+    Same as model.predict(X), for both scikit-learn and ONNX models.
+
+    Returns a 1D array with one prediction per row of X.
+    """
+    if hasattr(model, 'get_inputs'):
+        # ONNX Runtime session - first output is the label / value
+        input_name = model.get_inputs()[0].name
+        outputs = model.run(None, {input_name: np.asarray(X, dtype=np.float32)})
+        return np.ravel(outputs[0])
+
+    return model.predict(X)
+
+
+def scaler_as_multiply_add(preprocessor):
+    """
+    StandardScaler and MinMaxScaler only compute X * a + b.
+
+    Returns (a, b) for those scalers, or None for anything else (or if
+    X * a + b doesn't give the same numbers as preprocessor.transform).
+    """
+    if isinstance(preprocessor, StandardScaler):
+        # (X - mean) / scale  ==  X * (1 / scale) + (-mean / scale)
+        # Use the scaler's own flags: with_mean=False still fills in mean_,
+        # but transform never subtracts it
+        n = preprocessor.n_features_in_
+        a = 1.0 / preprocessor.scale_ if preprocessor.with_std else np.ones(n)
+        b = -preprocessor.mean_ * a if preprocessor.with_mean else np.zeros(n)
+    elif isinstance(preprocessor, MinMaxScaler) and not preprocessor.clip:
+        a, b = preprocessor.scale_, preprocessor.min_
+    else:
+        return None
+
+    # Check against the real transform on a couple of made-up rows, so a
+    # scaler setting we didn't think of falls back to transform instead
+    # of giving wrong predictions
+    n = len(a)
+    probe = np.arange(2 * n, dtype=np.float64).reshape(2, n) * 3.7 - n
+    if not np.allclose(probe * a + b, preprocessor.transform(probe)):
+        print(f"Scaler not folded into the model: {preprocessor!r} didn't match X * a + b")
+        return None
+
+    return a, b
+
+
+def build_predict(model, preprocessor, dtype, threshold=None):
+    """
+    Combine a scaler and a model into one predict(X) function.
+
+    Gives the same answer as run_model(model, preprocessor.transform(X)),
+    but skips scaler.transform:
+    - linear models (LogisticRegression, LinearRegression, Ridge etc): the
+      scaler is folded into the model weights once, so a prediction is
+      one dot product (no sklearn input checks)
+    - other models: X is scaled in place (no temporary array)
+    Any other preprocessing just uses preprocessor.transform.
+    Folded predict functions have predict.folded = True (see run_cpu).
+
+    dtype is the type of the feature arrays (float32 or float64), so the
+    scaler numbers match it.
+
+    threshold (optional, classifiers with predict_proba): predict the
+    second class when its probability is >= threshold, instead of using
+    model.predict.
+    """
+    classify = lambda X: run_model(model, X)
+    if threshold is not None:
+        classes = model.classes_
+        classify = lambda X: classes[(model.predict_proba(X)[:, 1] >= threshold).astype(int)]
+
+    multiply_add = scaler_as_multiply_add(preprocessor)
+    if multiply_add is None:
+        return lambda X: classify(preprocessor.transform(X))
+
+    a, b = (np.asarray(v, dtype=dtype) for v in multiply_add)
+
+    # coef . (X * a + b) + intercept  ==  X . (coef * a) + (coef . b + intercept)
+    # (np.ravel: a binary classifier's coef_ is (1, n) or just (n,),
+    # depending on the model and scikit-learn version)
+    if (isinstance(model, LINEAR_CLASSIFIERS) and len(model.classes_) == 2
+            and np.size(model.coef_) == len(a)
+            and (threshold is None or isinstance(model, LogisticRegression))):
+        coef = np.ravel(model.coef_).astype(dtype)
+        weights = coef * a
+        bias = dtype(np.ravel(model.intercept_)[0] + coef @ b)
+        classes = model.classes_
+
+        if threshold is None:
+            # Same rule as model.predict: second class when the score is > 0
+            compare, cutoff = operator.gt, dtype(0)
+        else:
+            # LogisticRegression: probability = 1 / (1 + exp(-score)), so
+            # probability >= threshold  <=>  score >= log(t / (1 - t))
+            # and the probability (an exp) never has to be worked out
+            compare, cutoff = operator.ge, dtype(math.log(threshold / (1 - threshold)))
+
+        def predict(X):
+            # One row (a normal request): a single number dot product -
+            # about twice as fast as building arrays for one answer
+            if len(X) == 1:
+                return (classes[int(compare(X[0] @ weights + bias, cutoff))],)
+            return classes[compare(X @ weights + bias, cutoff).astype(int)]
+
+        predict.folded = True
+        return predict
+
+    if isinstance(model, LINEAR_REGRESSORS) and np.ndim(model.coef_) == 1:
+        coef = model.coef_.astype(dtype)
+        weights = coef * a
+        bias = dtype(np.ravel(model.intercept_)[0] + coef @ b)
+
+        def predict(X):
+            if len(X) == 1:
+                return (X[0] @ weights + bias,)
+            return X @ weights + bias
+
+        predict.folded = True
+        return predict
+
+    def predict(X):
+        np.multiply(X, a, out=X)
+        np.add(X, b, out=X)
+        return classify(X)
+
+    return predict
+
+
+def load_threshold(path):
+    """The probability threshold saved in path, or None if there is no file"""
+    try:
+        with open(path) as f:
+            threshold = float(f.read())
+    except FileNotFoundError:
+        return None
+
+    if not 0 < threshold < 1:
+        raise ValueError(f"{path} must hold a number between 0 and 1, not {threshold}")
+
+    return threshold
 
 
 def load_rain_model():
     """Load rain prediction model (loads once, then cached)"""
-    global _rain_model, _rain_preprocessor
+    global _rain_model, _rain_preprocessor, _rain_predict
 
     if _rain_model is None:
-        _rain_model = joblib.load('app/models/rain_or_not/model.joblib')
-        _rain_preprocessor = joblib.load('app/models/rain_or_not/scaler.joblib')
-        # If you have threshold:
-        # with open('app/models/rain_or_not/threshold.txt') as f:
-        #     _rain_threshold = float(f.read())
+        # Load both files before saving either, so a missing scaler
+        # can't leave a half-loaded model behind.
+        # mmap_mode='r' lets worker processes share the arrays in memory.
+        model = load_model_file('app/models/rain_or_not')
+        preprocessor = joblib.load('app/models/rain_or_not/scaler.joblib', mmap_mode='r')
+
+        # Optional: rain when P(rain) >= the number in threshold.txt
+        threshold = load_threshold('app/models/rain_or_not/threshold.txt')
+        if threshold is not None and not hasattr(model, 'predict_proba'):
+            print("threshold.txt ignored: the rain model has no predict_proba")
+            threshold = None
+
+        # Features are float32 (see prepare_rain_features) - half the
+        # memory of float64 and the same predictions
+        _rain_predict = build_predict(model, preprocessor, np.float32, threshold)
+        _rain_model, _rain_preprocessor = model, preprocessor
 
     return _rain_model, _rain_preprocessor
 
 
 def load_precip_model():
     """Load precipitation prediction model (loads once, then cached)"""
-    global _precip_model, _precip_preprocessor
+    global _precip_model, _precip_preprocessor, _precip_predict
 
     if _precip_model is None:
-        _precip_model = joblib.load('app/models/precipitation_fall/model.joblib')
-        _precip_preprocessor = joblib.load('app/models/precipitation_fall/scaler.joblib')
+        model = load_model_file('app/models/precipitation_fall')
+        preprocessor = joblib.load('app/models/precipitation_fall/scaler.joblib', mmap_mode='r')
+        _precip_predict = build_predict(model, preprocessor, np.float32)
+        _precip_model, _precip_preprocessor = model, preprocessor
 
     return _precip_model, _precip_preprocessor
 
 
-def prepare_rain_features(weather_data):
+def load_models():
     """
-    Transform weather data into features for rain model.
+    Load every model up front (called once when main.py is imported).
 
-    CUSTOMIZE THIS TO MATCH YOUR TRAINING!
-    Use the same features in the same order as your training data.
+    This way no request ever pays for reading the model files, and the
+    predictions just use the loaded models - no "is it loaded?" checks.
+    Missing files are only reported here - the prediction endpoints
+    still answer with "Model not found" until you add them.
     """
-    # Example - replace with YOUR features
-    features = [
-        weather_data.get('temperature_2m_max', 0),
-        weather_data.get('temperature_2m_min', 0),
-        weather_data.get('precipitation_sum', 0),
-        weather_data.get('wind_speed_10m_max', 0),
-        # Add your features here in the SAME ORDER as training
-    ]
+    global _rain_predict, _precip_predict
+
+    try:
+        load_rain_model()
+    except FileNotFoundError as e:
+        print(f"Model not loaded: {e}")
+        _rain_predict = missing_model(e)
+
+    try:
+        load_precip_model()
+    except FileNotFoundError as e:
+        print(f"Model not loaded: {e}")
+        _precip_predict = missing_model(e)
 
-    # If you did circular encoding for wind direction:
-    # wind_dir = weather_data.get('wind_direction_10m_dominant', 0)
-    # wind_rad = np.radians(wind_dir)
-    # features.append(np.sin(wind_rad))
-    # features.append(np.cos(wind_rad))
 
-    # If you added seasonal features:
-    # month = datetime.strptime(date_str, "%Y-%m-%d").month
-    # month_angle = 2 * np.pi * (month - 1) / 12
-    # features.append(np.sin(month_angle))
-    # features.append(np.cos(month_angle))
+def missing_model(error):
+    """Stand-in predict(X) for a model whose files are missing"""
+    def predict(X):
+        raise FileNotFoundError(error.errno, error.strerror, error.filename)
 
-    return np.array([features])
+    return predict
 
 
-def prepare_precip_features(weather_data):
+def models_version():
     """
-    Transform weather data into features for precipitation model.
+    Short id that changes whenever any model file changes.
 
-    CUSTOMIZE THIS TO MATCH YOUR TRAINING!
+    Used in the prediction ETags, so browsers don't keep showing
+    predictions from an old model after you upload a new one.
     """
-    # Example - replace with YOUR features
-    features = [
-        weather_data.get('temperature_2m_max', 0),
-        weather_data.get('temperature_2m_min', 0),
-        weather_data.get('precipitation_sum', 0),
-        weather_data.get('wind_speed_10m_max', 0),
-        # Add your features here
-    ]
+    digest = hashlib.blake2b(digest_size=4)
+    for folder in ('app/models/rain_or_not', 'app/models/precipitation_fall'):
+        for name in sorted(os.listdir(folder)):
+            info = os.stat(os.path.join(folder, name))
+            digest.update(f"{folder}/{name}:{info.st_size}:{info.st_mtime_ns}".encode())
+
+    return digest.hexdigest()
+
+
+async def run_cpu(predict, function, *args):
+    """
+    Run function(*args), the model step for the predict function predict.
+
+    A folded linear model (see build_predict) takes a few microseconds, so
+    it just runs here. Anything else (a random forest can take several
+    milliseconds) runs in a thread, so other requests aren't kept waiting.
+    """
+    if getattr(predict, 'folded', False):
+        return function(*args)
+
+    return await asyncio.to_thread(function, *args)
+
+
+# sin/cos for circular features, worked out once instead of on every request.
+# MONTH_SIN[month - 1] == sin(2 * pi * (month - 1) / 12)
+# WIND_SIN[degrees] == sin(radians(degrees)) for whole degrees 0-359
+# (use wind_sin_cos below, it also handles any other value)
+MONTH_SIN = tuple(math.sin(2 * math.pi * m / 12) for m in range(12))
+MONTH_COS = tuple(math.cos(2 * math.pi * m / 12) for m in range(12))
+WIND_SIN = tuple(math.sin(math.radians(d)) for d in range(360))
+WIND_COS = tuple(math.cos(math.radians(d)) for d in range(360))
+
+
+def wind_sin_cos(degrees):
+    """
+    (sin, cos) of a wind direction in degrees.
+
+    Open Meteo gives whole degrees, which are looked up in the tables;
+    anything else is worked out with math.sin / math.cos.
+    """
+    whole = int(degrees)
+    if whole == degrees:
+        whole %= 360
+        return WIND_SIN[whole], WIND_COS[whole]
+
+    radians = math.radians(degrees)
+    return math.sin(radians), math.cos(radians)
 
-    return np.array([features])
 
+# Each thread keeps one feature array per model and refills it on every
+# request, instead of making a new array each time
+_buffers = threading.local()
 
-def predict_rain(date_str):
+
+def feature_buffer(name, n_features):
+    """
+    This thread's (1, n_features) float32 array for a model.
+
+    NOTE: it is overwritten by the next prediction in the same thread,
+    so copy it (X.copy()) if you need to keep it around.
     """
-    Predict if it will rain 7 days from date_str.
+    X = getattr(_buffers, name, None)
+    if X is None or X.shape[1] != n_features:
+        X = np.empty((1, n_features), dtype=np.float32)
+        setattr(_buffers, name, X)
+
+    return X
+
+
+# Number of features your rain model was trained on
+# (update this if you add or remove features below)
+N_RAIN_FEATURES = 4
+
+# Writes N float32 numbers straight into an array's memory
+RAIN_ROW = struct.Struct(f"={N_RAIN_FEATURES}f")
+
+
+def prepare_rain_features(weather_data, date_obj, X=None, row=0):
+    """
+    Transform weather data into features for rain model.
+
+    CUSTOMIZE THIS TO MATCH YOUR TRAINING!
+    Use the same features in the same order as your training data.
+
+    Fills row `row` of X (a float32 array with N_RAIN_FEATURES columns),
+    or this thread's (1, N) array if X is not given, and returns X.
+
+    Feature order (keep in sync with training and the values below):
+        temperature_2m_max, temperature_2m_min, precipitation_sum,
+        wind_speed_10m_max
+    """
+    # One row, one column per feature.
+    # (get_weather already turned missing values into 0, so no None
+    # checks are needed here.)
+    if X is None:
+        X = feature_buffer('rain', N_RAIN_FEATURES)
+    RAIN_ROW.pack_into(
+        X, row * RAIN_ROW.size,
+        # Example - replace with YOUR features
+        weather_data.get('temperature_2m_max', 0.0),
+        weather_data.get('temperature_2m_min', 0.0),
+        weather_data.get('precipitation_sum', 0.0),
+        weather_data.get('wind_speed_10m_max', 0.0),
+        # Add your features here in the SAME ORDER as training, e.g.
+        # circular encoding for wind direction (sin, cos):
+        # *wind_sin_cos(weather_data.get('wind_direction_10m_dominant', 0)),
+        # seasonal features (same as sin/cos of 2 * pi * (month - 1) / 12):
+        # MONTH_SIN[date_obj.month - 1], MONTH_COS[date_obj.month - 1],
+    )
+
+    return X
+
+
+# Number of features your precipitation model was trained on
+N_PRECIP_FEATURES = 4
+PRECIP_ROW = struct.Struct(f"={N_PRECIP_FEATURES}f")
+
+
+def prepare_precip_features(weather_data, date_obj):
+    """
+    Transform weather data into features for precipitation model.
+
+    CUSTOMIZE THIS TO MATCH YOUR TRAINING!
+
+    Feature order (keep in sync with training and the values below):
+        temperature_2m_max, temperature_2m_min, precipitation_sum,
+        wind_speed_10m_max
+    """
+    # Fill a (1, N) float32 array - one row, one column per feature.
+    # The values go straight into the array in a fixed order - no dict of
+    # features or list of names to look them up by.
+    X = feature_buffer('precip', N_PRECIP_FEATURES)
+    PRECIP_ROW.pack_into(
+        X, 0,
+        # Example - replace with YOUR features
+        weather_data.get('temperature_2m_max', 0.0),
+        weather_data.get('temperature_2m_min', 0.0),
+        weather_data.get('precipitation_sum', 0.0),
+        weather_data.get('wind_speed_10m_max', 0.0),
+        # Add your features here, e.g. seasonal features
+        # (same as sin/cos of 2 * pi * (month - 1) / 12):
+        # MONTH_SIN[date_obj.month - 1], MONTH_COS[date_obj.month - 1],
+        # or wind direction (sin, cos):
+        # *wind_sin_cos(weather_data.get('wind_direction_10m_dominant', 0)),
+    )
+
+    return X
+
+
+# How far ahead each model predicts (made once, not on every request)
+RAIN_DAYS_AHEAD = timedelta(days=7)
+PRECIP_FIRST_DAY = timedelta(days=1)
+PRECIP_LAST_DAY = timedelta(days=3)
+
+
+async def predict_rain(date_obj):
+    """
+    Predict if it will rain 7 days from date_obj (a datetime.date).
 
     Returns:
         {
@@ -104,43 +468,98 @@ def predict_rain(date_str):
             }
         }
     """
-    # Load model
-    model, preprocessor = load_rain_model()
+    result = _cache_get(_rain_cache, date_obj)
+    if result is None:
+        # Get weather data for input date (waits on the network, not the CPU)
+        weather = await get_weather(date_obj)
 
-    # Get weather data for input date
-    weather = get_weather(date_str)
+        # Run the model (in a thread if it is a slow one)
+        result = await run_cpu(_rain_predict, _predict_rain_cpu, date_obj, weather)
+        _cache_put(_rain_cache, date_obj, result)
 
-    # Prepare features (CUSTOMIZE prepare_rain_features!)
-    X = prepare_rain_features(weather)
+    return result
 
-    # Apply preprocessing (scaler, etc)
-    X_processed = preprocessor.transform(X)
 
-    # Make prediction
-    # For classification:
-    prediction = model.predict(X_processed)[0]
+def _predict_rain_cpu(date_obj, weather):
+    """Turn weather data into the rain prediction (the CPU part)"""
+    # Prepare features (CUSTOMIZE prepare_rain_features!)
+    X = prepare_rain_features(weather, date_obj)
+
+    # Apply preprocessing (scaler, etc) and make prediction in one step
+    # with the models loaded at startup (see load_rain_model).
+    # Same as: run_model(_rain_model, _rain_preprocessor.transform(X))[0]
+    # or, if you saved a threshold.txt:
+    # _rain_model.predict_proba(_rain_preprocessor.transform(X))[0, 1] >= threshold
+    prediction = _rain_predict(X)[0]
     will_rain = bool(prediction)
 
-    # Or if using probabilities with threshold:
-    # prob = model.predict_proba(X_processed)[0, 1]
-    # will_rain = prob >= threshold
-
     # Calculate prediction date (7 days ahead)
-    input_date = datetime.strptime(date_str, "%Y-%m-%d")
-    pred_date = input_date + timedelta(days=7)
+    pred_date = date_obj + RAIN_DAYS_AHEAD
 
     return {
-        "input_date": date_str,
+        "input_date": date_obj.isoformat(),
         "prediction": {
-            "date": pred_date.strftime("%Y-%m-%d"),
+            "date": pred_date.isoformat(),
             "will_rain": will_rain
         }
     }
 
 
-def predict_precipitation(date_str):
+# Most dates one batch request can ask for
+MAX_BATCH_SIZE = 366
+
+
+async def predict_rain_batch(date_objs):
+    """
+    Predict rain 7 days ahead for several dates (datetime.date) at once.
+
+    Much cheaper than calling predict_rain for each date: the weather is
+    fetched all at once and the model runs once for all the dates.
+
+    Returns a list of predict_rain results, in the same order as date_objs.
     """
-    Predict precipitation for next 3 days from date_str.
+    if len(date_objs) > MAX_BATCH_SIZE:
+        raise ValueError(f"Too many dates ({len(date_objs)}), the limit is {MAX_BATCH_SIZE}")
+
+    results = {d: _cache_get(_rain_cache, d) for d in date_objs}
+    missing = sorted(d for d, result in results.items() if result is None)
+
+    if missing:
+        # Fetch all the missing days at once (saved days come from the cache)
+        days = await get_weather_days(missing)
+        weathers = [days[d] for d in missing]
+        batch = await run_cpu(_rain_predict, _predict_rain_batch_cpu, missing, weathers)
+        for d, result in zip(missing, batch):
+            _cache_put(_rain_cache, d, result)
+            results[d] = result
+
+    return [results[d] for d in date_objs]
+
+
+def _predict_rain_batch_cpu(date_objs, weathers):
+    """Rain predictions for many dates with ONE model call"""
+    # One row of features per date
+    X = np.empty((len(date_objs), N_RAIN_FEATURES), dtype=np.float32)
+    for row, (date_obj, weather) in enumerate(zip(date_objs, weathers)):
+        prepare_rain_features(weather, date_obj, X, row)
+
+    predictions = _rain_predict(X)
+
+    return [
+        {
+            "input_date": date_obj.isoformat(),
+            "prediction": {
+                "date": (date_obj + RAIN_DAYS_AHEAD).isoformat(),
+                "will_rain": bool(prediction)
+            }
+        }
+        for date_obj, prediction in zip(date_objs, predictions)
+    ]
+
+
+async def predict_precipitation(date_obj):
+    """
+    Predict precipitation for next 3 days from date_obj (a datetime.date).
 
     Returns:
         {
@@ -152,34 +571,39 @@ def predict_precipitation(date_str):
             }
         }
     """
-    # Load model
-    model, preprocessor = load_precip_model()
+    result = _cache_get(_precip_cache, date_obj)
+    if result is None:
+        # Get weather data for input date
+        weather = await get_weather(date_obj)
 
-    # Get weather data for input date
-    weather = get_weather(date_str)
+        # Run the model (in a thread if it is a slow one)
+        result = await run_cpu(_precip_predict, _predict_precip_cpu, date_obj, weather)
+        _cache_put(_precip_cache, date_obj, result)
+
+    return result
 
-    # Prepare features (CUSTOMIZE prepare_precip_features!)
-    X = prepare_precip_features(weather)
 
-    # Apply preprocessing
-    X_processed = preprocessor.transform(X)
+def _predict_precip_cpu(date_obj, weather):
+    """Turn weather data into the precipitation prediction (the CPU part)"""
+    # Prepare features (CUSTOMIZE prepare_precip_features!)
+    X = prepare_precip_features(weather, date_obj)
 
-    # Make prediction
-    precip_mm = model.predict(X_processed)[0]
+    # Apply preprocessing and make prediction
+    # Same as: run_model(_precip_model, _precip_preprocessor.transform(X))[0]
+    precip_mm = _precip_predict(X)[0]
 
     # Ensure non-negative
     precip_mm = max(0, float(precip_mm))
 
     # Calculate date range
-    input_date = datetime.strptime(date_str, "%Y-%m-%d")
-    start_date = input_date + timedelta(days=1)
-    end_date = input_date + timedelta(days=3)
+    start_date = date_obj + PRECIP_FIRST_DAY
+    end_date = date_obj + PRECIP_LAST_DAY
 
     return {
-        "input_date": date_str,
+        "input_date": date_obj.isoformat(),
         "prediction": {
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": end_date.strftime("%Y-%m-%d"),
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
             "precipitation_fall": f"{precip_mm:.1f}"
         }
     }
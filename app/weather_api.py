@@ -1,69 +1,318 @@
 """
 Gets weather data from Open Meteo API.
 
-Simple function that fetches historical weather for a specific date.
+Simple functions that fetch historical weather for a date (or a range of dates).
 """
 
-import requests
-from datetime import datetime
-import pytz
+import asyncio
+import httpx
+import orjson
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 
 
-def get_weather(date_str):
+# What to ask Open Meteo for
+OPEN_METEO_URL = "https://archive-api.open-meteo.com/v1/archive"
+LATITUDE = -33.8678  # Sydney
+LONGITUDE = 151.2073
+DAILY_VARIABLES = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "precipitation_sum",
+    "wind_speed_10m_max",
+    "wind_direction_10m_dominant",
+    # Add whatever weather variables you need
+]
+
+# Look up the timezone once, not on every request
+SYDNEY_TZ = ZoneInfo('Australia/Sydney')
+
+# Weather for a past date never changes, so every day we fetch is saved here
+# and never fetched again - even after a restart, and shared by all workers.
+# Saved days are labelled with the location + variables they were fetched
+# with, so changing DAILY_VARIABLES above fetches fresh data.
+CACHE_PATH = 'app/cache.db'
+CACHE_QUERY = f"{LATITUDE},{LONGITUDE},{','.join(sorted(DAILY_VARIABLES))}"
+_cache_db = None
+
+# The most recently used saved days are also kept in memory, so asking for
+# the same date again (e.g. rain, then precipitation) skips the database too
+MEMORY_CACHE_SIZE = 1024
+_recent_days = OrderedDict()
+
+# One HTTP client shared by every request (opened/closed by main.py's lifespan)
+_client = None
+
+
+def open_client():
+    """Create the shared HTTP client (called once at app startup)"""
+    global _client
+
+    if _client is None:
+        # Keeps connections to Open Meteo open between requests, so we don't
+        # redo the TLS handshake every time. HTTP/2 sends many requests
+        # down one connection at once.
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=10,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        )
+
+    return _client
+
+
+async def close_client():
+    """Close the shared HTTP client (called once at app shutdown)"""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def open_cache():
+    """Open the weather cache database (creates it the first time)"""
+    global _cache_db
+
+    if _cache_db is None:
+        # Autocommit + WAL mode: several server processes can read at once.
+        # synchronous=NORMAL skips waiting for the disk on every save, so
+        # saving never holds up other requests (worst case after a power
+        # cut: the last few days get fetched again).
+        db = sqlite3.connect(CACHE_PATH, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS weather_days "
+            "(query TEXT, date TEXT, payload BLOB, PRIMARY KEY (query, date))"
+        )
+        _cache_db = db
+
+    return _cache_db
+
+
+def close_cache():
+    """Close the weather cache database (called once at app shutdown)"""
+    global _cache_db
+
+    if _cache_db is not None:
+        _cache_db.close()
+        _cache_db = None
+
+
+def remember_days(days):
+    """Keep saved days in memory, forgetting the oldest when there are too many"""
+    for day, weather in days.items():
+        _recent_days[day] = weather
+        _recent_days.move_to_end(day)
+    while len(_recent_days) > MEMORY_CACHE_SIZE:
+        _recent_days.popitem(last=False)
+
+
+def load_cached_weather(start_date, end_date):
+    """Return {date: weather} for the days in the range we have already saved"""
+    n_days = (end_date - start_date).days + 1
+
+    # Try memory first...
+    days = {}
+    for i in range(n_days):
+        day = start_date + timedelta(days=i)
+        if day in _recent_days:
+            days[day] = _recent_days[day]
+    if len(days) == n_days:
+        remember_days(days)
+        return days
+
+    # ...then the database
+    rows = open_cache().execute(
+        "SELECT date, payload FROM weather_days WHERE query = ? AND date BETWEEN ? AND ?",
+        (CACHE_QUERY, start_date.isoformat(), end_date.isoformat()),
+    )
+    days = {date.fromisoformat(day): orjson.loads(payload) for day, payload in rows}
+    remember_days(days)
+    return days
+
+
+def save_cached_weather(days):
+    """Save fetched days - only complete ones, recent days can still be filled in later"""
+    complete = {
+        day: weather
+        for day, weather in days.items()
+        if weather and None not in weather.values()
+    }
+    rows = [(CACHE_QUERY, day.isoformat(), orjson.dumps(weather)) for day, weather in complete.items()]
+    open_cache().executemany("INSERT OR REPLACE INTO weather_days VALUES (?, ?, ?)", rows)
+    remember_days(complete)
+
+
+async def get_weather(date_obj):
     """
     Fetch weather data for Sydney on a specific date.
 
     Args:
-        date_str: Date in YYYY-MM-DD format (e.g., "2024-09-15")
+        date_obj: The date (a datetime.date, e.g. date(2024, 9, 15))
 
     Returns:
         Dictionary with weather data
 
     Raises:
-        ValueError: If date is invalid or in the future
+        ValueError: If date is invalid, in the future or not complete yet
+    """
+    days, incomplete = await get_weather_range(date_obj, date_obj)
+    check_complete([date_obj], days, incomplete)
+
+    return days[date_obj]
+
+
+def check_complete(dates, days, incomplete):
+    """
+    Raise ValueError unless every date has all its weather values.
+
+    Open Meteo fills in the last few days a bit at a time. Predicting from
+    the zeros we put in their place would give a wrong answer that then
+    gets remembered, so those dates are turned away until the data is in.
+    """
+    for d in dates:
+        if d not in days:
+            raise ValueError(f"No weather data available for {d}")
+        if d in incomplete:
+            raise ValueError(f"Weather data for {d} is not complete yet, try again later")
+
+
+def sydney_today():
+    """Today's date in Sydney (worked out at most once a minute)"""
+    return _sydney_today(int(time.time() // 60))
+
+
+@lru_cache(maxsize=1)
+def _sydney_today(minute):
+    # minute changes every 60 seconds, so the cached answer is never
+    # more than a minute old
+    return datetime.now(SYDNEY_TZ).date()
+
+
+# get_weather_days fetches dates within a week of each other in one request
+# (asking for a few extra days is cheaper than another round trip, and the
+# limit keeps it from ever asking for much more than it needs)
+MAX_RUN_SPAN = timedelta(days=7)
+
+
+async def get_weather_days(dates):
+    """
+    Fetch weather data for Sydney for many dates, which may be far apart.
+
+    Dates close together are fetched with one request (get_weather_range),
+    and those requests all run at the same time, so 30 scattered dates take
+    about as long as one.
+
+    Args:
+        dates: The dates (datetime.date objects, any order)
+
+    Returns:
+        Dictionary of {date: weather data dictionary} for every date asked for
+
+    Raises:
+        ValueError: If a date is invalid, in the future, has no data or
+            is not complete yet
     """
-    # Check date is not in future (Sydney timezone)
-    sydney_tz = pytz.timezone('Australia/Sydney')
-    today = datetime.now(sydney_tz).date()
-    date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    # Split the sorted dates into runs that each cover at most MAX_RUN_SPAN
+    runs = []
+    for d in sorted(set(dates)):
+        if runs and d - runs[-1][0] <= MAX_RUN_SPAN:
+            runs[-1].append(d)
+        else:
+            runs.append([d])
+
+    # Fetch every run at once
+    days, incomplete = {}, set()
+    for run_days, run_incomplete in await asyncio.gather(*(get_weather_range(run[0], run[-1]) for run in runs)):
+        days.update(run_days)
+        incomplete.update(run_incomplete)
 
-    if date > today:
-        raise ValueError(f"Date {date_str} is in the future. Use dates before {today}.")
+    check_complete(dates, days, incomplete)
+
+    return days
+
+
+async def get_weather_range(start_date, end_date):
+    """
+    Fetch weather data for Sydney for every day from start_date to end_date.
+
+    Uses ONE request to Open Meteo for the whole range - much faster than
+    asking for each day separately when you need several days.
+
+    Args:
+        start_date: First day (a datetime.date)
+        end_date: Last day, included (a datetime.date)
+
+    Returns:
+        (days, incomplete):
+        days is a dictionary of {date: weather data dictionary} (missing
+        values are 0), and incomplete is the set of dates that had missing
+        values (Open Meteo hasn't filled them in yet)
+
+    Raises:
+        ValueError: If a date is invalid or in the future
+    """
+    # Check dates are not in future (Sydney timezone)
+    today = sydney_today()
+
+    if end_date > today:
+        raise ValueError(f"Date {end_date} is in the future. Use dates before {today}.")
+    if start_date > end_date:
+        raise ValueError(f"Start date {start_date} is after end date {end_date}.")
+
+    # Already saved every day we need? Then no need to ask Open Meteo
+    days = load_cached_weather(start_date, end_date)
+    if len(days) == (end_date - start_date).days + 1:
+        return days, set()  # only complete days are ever saved
 
     # Open Meteo API parameters
-    url = "https://archive-api.open-meteo.com/v1/archive"
     params = {
-        "latitude": -33.8678,  # Sydney
-        "longitude": 151.2073,
-        "start_date": date_str,
-        "end_date": date_str,
-        "daily": [
-            "temperature_2m_max",
-            "temperature_2m_min",
-            "precipitation_sum",
-            "wind_speed_10m_max",
-            "wind_direction_10m_dominant",
-            # Add whatever weather variables you need
-        ],
+        "latitude": LATITUDE,
+        "longitude": LONGITUDE,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "daily": DAILY_VARIABLES,
         "timezone": "Australia/Sydney"
     }
 
-    # Make request
+    # Make request (await lets the server handle other requests meanwhile)
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = await open_client().get(OPEN_METEO_URL, params=params)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
     except Exception as e:
         raise ConnectionError(f"Failed to fetch weather data: {str(e)}")
 
-    # Extract daily data (first day since we only requested one)
+    # Extract daily data - each variable is a list with one value per day
     if "daily" not in data:
-        raise ValueError(f"No weather data available for {date_str}")
+        raise ValueError(f"No weather data available for {start_date} to {end_date}")
 
+    # Only keep the variables we asked for (DAILY_VARIABLES), so every day
+    # has the same keys no matter what else Open Meteo sends back
     daily = data["daily"]
-    weather = {}
-    for key, values in daily.items():
-        if key != "time" and values:
-            weather[key] = values[0]
+    columns = [(key, daily[key]) for key in DAILY_VARIABLES if daily.get(key)]
+    days = {
+        date.fromisoformat(day): {key: values[i] for key, values in columns}
+        for i, day in enumerate(daily.get("time", []))
+    }
+
+    save_cached_weather(days)
+
+    # Missing values (None) become 0 here, so code using the weather
+    # never has to check for None - but remember which days had them
+    incomplete = set()
+    for day, weather in days.items():
+        if not weather:
+            incomplete.add(day)
+        for key, value in weather.items():
+            if value is None:
+                weather[key] = 0.0
+                incomplete.add(day)
 
-    return weather
+    return days, incomplete